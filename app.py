@@ -1,14 +1,13 @@
 import os
-import json
 import numpy as np
 from sentence_transformers import SentenceTransformer
-import faiss
 import logging
 import streamlit as st
 from pathlib import Path
 import re
 from transformers import pipeline
 import torch
+from shards import MANIFEST_PATH, load_manifest, load_shard, route_query, search_shards
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
@@ -16,8 +15,6 @@ logger = logging.getLogger(__name__)
 
 # Folder paths
 CLEANED_FOLDER = r'C:/Users/sreevishak/Desktop/DUK/legalchatbot/cleaned_data'
-VECTOR_STORE_PATH = r'C:/Users/sreevishak/Desktop/DUK/legalchatbot/vector_store.faiss'
-METADATA_PATH = r'C:/Users/sreevishak/Desktop/DUK/legalchatbot/metadata.json'
 
 # Load embedding model
 model = SentenceTransformer('all-MiniLM-L6-v2')
@@ -39,11 +36,15 @@ def normalize_sections(sections):
             cleaned.add(sec.upper())
     return list(cleaned)
 
-def load_vector_store():
-    try:
-        index = faiss.read_index(VECTOR_STORE_PATH)
-        with open(METADATA_PATH, 'r', encoding='utf-8') as f:
-            metadata = json.load(f)
+@st.cache_resource(max_entries=1)
+def load_shards(manifest_mtime):
+    # manifest_mtime only keys the cache, so a rebuild makes the next rerun reload
+    manifest = load_manifest()
+    if not manifest:
+        raise FileNotFoundError("no shards found, run vecrtor.py to build them")
+    shards = {}
+    for name, info in manifest.items():
+        index, metadata = load_shard(name, info)
         for meta in metadata:
             if not meta.get('case_id') or meta['case_id'].startswith("Unknown"):
                 case_id_match = re.search(r'(Crl\.MC\.No\.|CRL\.MC\s+NO\.|CC|SC|W\.P\.)\s*[\d/]+\s*(?:of\s*\d+)?\s*(?:\([^)]*\))?', meta['full_text'], re.IGNORECASE)
@@ -52,21 +53,36 @@ def load_vector_store():
             if 'judge' not in meta:
                 judge_match = re.search(r'(?:Justice|Honourable\s+Mr\.?|Mrs\.?)\s+[A-Za-z\s]+', meta['full_text'], re.IGNORECASE)
                 meta['judge'] = judge_match.group(0) if judge_match else "Not specified"
-        return index, metadata
+        shards[name] = (index, metadata)
+    return manifest, shards
+
+def manifest_mtime():
+    return os.path.getmtime(MANIFEST_PATH) if os.path.exists(MANIFEST_PATH) else None
+
+def load_vector_store():
+    try:
+        try:
+            return load_shards(manifest_mtime())
+        except (FileNotFoundError, ValueError) as e:
+            # A rebuild may have switched the manifest while the shards were being read
+            logger.warning(f"Shards changed while loading ({e}), retrying")
+            return load_shards(manifest_mtime())
     except Exception as e:
         st.error(f"Error loading vector store: {e}")
         return None, None
 
-def query_vector_store(query, index, metadata, top_k=20):
+def query_vector_store(query, manifest, shards, top_k=20):
+    # Only search shards for the court/year named in the query, else fan out to all
+    names = route_query(query, manifest)
+    logger.info(f"Searching {len(names)} of {len(manifest)} shards")
     query_embedding = model.encode([query])
-    distances, indices = index.search(query_embedding, top_k)
     results = [
         {
-            'metadata': metadata[idx],
-            'distance': float(dist),
-            'cosine_similarity': 1 - (dist / 2)
+            'metadata': r['metadata'],
+            'distance': r['distance'],
+            'cosine_similarity': 1 - (r['distance'] / 2)
         }
-        for idx, dist in zip(indices[0], distances[0])
+        for r in search_shards(query_embedding, shards, names, top_k)
     ]
     # Exact case ID match
     case_id_match = re.search(r'(Crl\.MC\.No\.|CRL\.MC\s+NO\.)\s*\d+\s*(?:of|OF)\s*\d+', query, re.IGNORECASE)
@@ -128,8 +144,8 @@ def generate_natural_response(query, top_results):
         return f"I had trouble generating a response ({e}). For {case['metadata']['case_id']}, it was {case['metadata']['outcome']} on {case['metadata']['date']} at {case['metadata']['court']} with {case['metadata']['judge']} presiding."
 
 def main():
-    index, metadata = load_vector_store()
-    if index is None or metadata is None:
+    manifest, shards = load_vector_store()
+    if manifest is None or shards is None:
         return
 
     st.title("KELBot: Interactive Legal Chatbot⚖️")
@@ -150,7 +166,7 @@ def main():
             st.markdown(query)
 
         with st.spinner("Processing..."):
-            top_results = query_vector_store(query, index, metadata)
+            top_results = query_vector_store(query, manifest, shards)
             response = generate_natural_response(query, top_results)
             
             st.session_state.chat_history.append({"role": "assistant", "content": response})
@@ -0,0 +1,291 @@
+import os
+import errno
+import json
+import re
+import logging
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import faiss
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+# Folder paths
+SHARD_FOLDER = r'C:/Users/sreevishak/Desktop/DUK/legalchatbot/shards'
+MANIFEST_PATH = os.path.join(SHARD_FOLDER, 'shards.json')
+LOCK_PATH = os.path.join(SHARD_FOLDER, 'shards.lock')
+
+# Number of threads used to search shards in parallel
+SEARCH_WORKERS = min(8, os.cpu_count() or 1)
+
+# Shard keys used when a case's court or year could not be parsed
+UNKNOWN_COURT = 'unknown_court'
+UNKNOWN_YEAR = 'unknown_year'
+
+# High court seats that can follow the state name in a court header
+HIGH_COURT_SEATS = {
+    'ernakulam', 'kochi', 'cochin', 'ahmedabad', 'mumbai', 'bombay', 'nagpur', 'aurangabad', 'goa',
+    'chennai', 'madras', 'madurai', 'kolkata', 'calcutta', 'allahabad', 'lucknow', 'bengaluru',
+    'bangalore', 'dharwad', 'hyderabad', 'amaravati', 'chandigarh', 'jabalpur', 'indore', 'gwalior',
+    'patna', 'jodhpur', 'jaipur', 'cuttack', 'guwahati', 'shimla', 'srinagar', 'jammu', 'ranchi',
+    'bilaspur', 'nainital', 'imphal', 'shillong', 'agartala', 'gangtok', 'delhi'
+}
+
+# "284 of 2024" / "284/2024": the year in a case number is the filing year,
+# which often differs from the judgment year the shards are keyed on
+CASE_NUMBER_PATTERN = r'\b\d+\s*(?:of|/)\s*(?:19|20)\d{2}\b'
+
+# "POCSO Act, 2012" / "NDPS Act 1985": the year an Act was passed, not a judgment year
+STATUTE_YEAR_PATTERN = r'\bAct\s*,?\s*(?:of\s+)?(?:19|20)\d{2}\b'
+
+# "between 2015 and 2018", "from 2015 to 2018", "2015 to 2018", "2015-2018"
+YEAR_RANGE_PATTERN = r'\b(?:between\s+((?:19|20)\d{2})\s+and\s+|((?:19|20)\d{2})\s*(?:-|–|to)\s*)((?:19|20)\d{2})\b'
+
+def court_key(court):
+    """Map a raw court string to a short slug, e.g. 'HIGH COURT OF KERALA AT ERNAKULAM' -> 'high_court_of_kerala'."""
+    court = court or ''
+    hc_match = re.search(r'HIGH\s+COURT\s+OF\s+([A-Z]+)(?:\s+([A-Z]+))?', court, re.IGNORECASE)
+    if hc_match:
+        state = hc_match.group(1).lower()
+        # OCR sometimes glues "AT" onto the state ("KERALAAT ERNAKULAM"); only
+        # strip it when a known seat follows so e.g. GUJARAT is left alone
+        next_word = (hc_match.group(2) or '').lower()
+        if state.endswith('at') and next_word in HIGH_COURT_SEATS:
+            state = state[:-2]
+        return f"high_court_of_{state}"
+    if re.search(r'SUPREME\s+COURT|APEX\s+COURT', court, re.IGNORECASE):
+        return 'supreme_court'
+    return UNKNOWN_COURT
+
+def year_key(date):
+    years = re.findall(r'\b(?:19|20)\d{2}\b', date or '')
+    return years[-1] if years else UNKNOWN_YEAR
+
+def shard_name(meta):
+    return f"{court_key(meta.get('court'))}_{year_key(meta.get('date'))}"
+
+def shard_paths(name, generation):
+    shard_dir = os.path.join(SHARD_FOLDER, name, generation)
+    return os.path.join(shard_dir, 'vector_store.faiss'), os.path.join(shard_dir, 'metadata.json')
+
+@contextmanager
+def manifest_lock():
+    """Hold an exclusive lock on the shard folder so concurrent rebuilds update the manifest one at a time."""
+    os.makedirs(SHARD_FOLDER, exist_ok=True)
+    with open(LOCK_PATH, 'a+') as f:
+        if os.name == 'nt':
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError as e:
+                    # LK_LOCK gives up after ~10 seconds while the lock is held, keep waiting
+                    if e.errno not in (errno.EDEADLOCK, errno.EACCES):
+                        raise
+                    logger.info("Waiting for another rebuild to release the shard manifest lock")
+        else:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == 'nt':
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def load_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _atomic_write_json(path, data):
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+        tmp_path = f.name
+        try:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        except Exception:
+            f.close()
+            os.remove(tmp_path)
+            raise
+    os.replace(tmp_path, path)
+
+def write_shard(name, index, metadata):
+    # Every build goes into its own generation directory. Readers keep using
+    # the generation listed in the manifest until update_manifest() switches it
+    parent = os.path.join(SHARD_FOLDER, name)
+    os.makedirs(parent, exist_ok=True)
+    shard_dir = tempfile.mkdtemp(prefix=time.strftime('%Y%m%d%H%M%S_'), dir=parent)
+    generation = os.path.basename(shard_dir)
+    index_path, metadata_path = shard_paths(name, generation)
+    faiss.write_index(index, index_path)
+    with open(metadata_path, 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=4)
+    logger.info(f"Shard {name} saved with {len(metadata)} cases (generation {generation})")
+    return generation
+
+def _remove_path(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    elif os.path.exists(path):
+        os.remove(path)
+
+def _prune_generations(old_manifest, manifest):
+    # The generation just superseded is kept as previous_generation so a reader
+    # that loaded the old manifest can still open it; the one before that goes
+    for name, info in old_manifest.items():
+        current = manifest.get(name)
+        if current is None:
+            _remove_path(os.path.join(SHARD_FOLDER, name))
+        elif current['generation'] != info['generation'] and info.get('previous_generation'):
+            if info['previous_generation'] not in (current['generation'], current.get('previous_generation')):
+                _remove_path(os.path.join(SHARD_FOLDER, name, info['previous_generation']))
+
+def _prune_unreferenced(manifest):
+    # Clears shards and generations nothing points to any more, including
+    # builds that are still in progress, hence full rebuilds only
+    for name in os.listdir(SHARD_FOLDER):
+        path = os.path.join(SHARD_FOLDER, name)
+        if not os.path.isdir(path):
+            continue
+        if name not in manifest:
+            _remove_path(path)
+            continue
+        keep = {manifest[name]['generation'], manifest[name].get('previous_generation')}
+        for generation in os.listdir(path):
+            if generation not in keep:
+                _remove_path(os.path.join(path, generation))
+
+def update_manifest(entries, removed=(), replace=False):
+    """Point the given shards at their new generations in one atomic manifest write.
+
+    Other shards are kept unless they are listed in removed, or replace is set
+    (a full rebuild), in which case the manifest becomes exactly entries and
+    every unreferenced shard directory is deleted. The generation each shard
+    replaces stays on disk until the next rebuild of that shard.
+    """
+    with manifest_lock():
+        for name, info in entries.items():
+            if not os.path.isdir(os.path.join(SHARD_FOLDER, name, info['generation'])):
+                raise FileNotFoundError(f"Generation {info['generation']} of shard {name} is missing")
+        old_manifest = load_manifest()
+        manifest = {} if replace else dict(old_manifest)
+        for name in removed:
+            manifest.pop(name, None)
+        for name, info in entries.items():
+            info = dict(info)
+            if name in old_manifest and old_manifest[name]['generation'] != info['generation']:
+                info['previous_generation'] = old_manifest[name]['generation']
+            manifest[name] = info
+        _atomic_write_json(MANIFEST_PATH, manifest)
+        if replace:
+            _prune_unreferenced(manifest)
+        else:
+            _prune_generations(old_manifest, manifest)
+    return manifest
+
+def load_shard(name, info):
+    index_path, metadata_path = shard_paths(name, info['generation'])
+    index = faiss.read_index(index_path)
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    if not index.ntotal == len(metadata) == info['size']:
+        raise ValueError(
+            f"Shard {name} is inconsistent: {index.ntotal} vectors, {len(metadata)} metadata entries, "
+            f"{info['size']} expected"
+        )
+    return index, metadata
+
+def load_shard_files(name, info):
+    _, metadata_path = shard_paths(name, info['generation'])
+    with open(metadata_path, 'r', encoding='utf-8') as f:
+        return {meta['file'] for meta in json.load(f)}
+
+def query_years(query):
+    """Judgment years named in a query, with ranges expanded and statute years ignored."""
+    query = re.sub(STATUTE_YEAR_PATTERN, ' ', query, flags=re.IGNORECASE)
+    years = set()
+    for start, alt_start, end in re.findall(YEAR_RANGE_PATTERN, query, re.IGNORECASE):
+        low, high = sorted((int(start or alt_start), int(end)))
+        years.update(str(year) for year in range(low, high + 1))
+    years.update(re.findall(r'\b(?:19|20)\d{2}\b', query))
+    return years
+
+def query_courts(query, manifest):
+    query_lower = query.lower()
+    courts = set()
+    if re.search(r'\bapex\s+court\b', query_lower):
+        courts.add('supreme_court')
+    for info in manifest.values():
+        court = info['court']
+        label = court.replace('_', ' ')
+        state = court[len('high_court_of_'):] if court.startswith('high_court_of_') else None
+        if label in query_lower or (state and re.search(rf'\b{state}\b', query_lower)):
+            courts.add(court)
+    return courts
+
+def route_query(query, manifest):
+    """Pick the shards a query should hit based on any court or year it names; all shards otherwise."""
+    # Case IDs are looked up across every shard, see CASE_NUMBER_PATTERN
+    if re.search(CASE_NUMBER_PATTERN, query, re.IGNORECASE):
+        return list(manifest)
+
+    # Filters are only worth applying if some shard with a known value matches;
+    # otherwise they would leave just the unknown_court/unknown_year shards
+    years = query_years(query)
+    if years and not any(info['year'] in years for info in manifest.values()):
+        logger.warning(f"No shard holds years {sorted(years)}, ignoring the year filter")
+        years = set()
+    courts = query_courts(query, manifest)
+    if courts and not any(info['court'] in courts for info in manifest.values()):
+        logger.warning(f"No shard holds courts {sorted(courts)}, ignoring the court filter")
+        courts = set()
+    if not years and not courts:
+        return list(manifest)
+    if not any(
+        (not years or info['year'] in years) and (not courts or info['court'] in courts)
+        for info in manifest.values()
+    ):
+        logger.warning(f"No shard matches courts={sorted(courts)} years={sorted(years)}, searching all shards")
+        return list(manifest)
+
+    # Shards with an unknown court or year may still hold matching cases
+    return [
+        name for name, info in manifest.items()
+        if (not years or info['year'] in years or info['year'] == UNKNOWN_YEAR)
+        and (not courts or info['court'] in courts or info['court'] == UNKNOWN_COURT)
+    ]
+
+def _search_shard(shard, query_embedding, top_k):
+    index, metadata = shard
+    k = min(top_k, index.ntotal)
+    if k == 0:
+        return []
+    distances, indices = index.search(query_embedding, k)
+    return [
+        {'metadata': metadata[idx], 'distance': float(dist)}
+        for idx, dist in zip(indices[0], distances[0])
+        if idx != -1
+    ]
+
+def search_shards(query_embedding, shards, names, top_k=20):
+    """Search the named shards in a thread pool and merge their hits into one top_k list."""
+    names = [name for name in names if name in shards]
+    if not names:
+        return []
+    if len(names) == 1:
+        results = _search_shard(shards[names[0]], query_embedding, top_k)
+    else:
+        with ThreadPoolExecutor(max_workers=min(SEARCH_WORKERS, len(names))) as executor:
+            per_shard = executor.map(lambda name: _search_shard(shards[name], query_embedding, top_k), names)
+            results = [r for shard_results in per_shard for r in shard_results]
+    return sorted(results, key=lambda r: r['distance'])[:top_k]
@@ -0,0 +1,122 @@
+import pytest
+from shards import court_key, year_key, route_query, search_shards
+
+# Mirrors the layout cleaned_data produces, including the unknown shards
+MANIFEST = {
+    f"{court}_{year}": {'court': court, 'year': year}
+    for court, year in [
+        ('high_court_of_kerala', '2014'),
+        ('high_court_of_kerala', '2015'),
+        ('high_court_of_kerala', '2016'),
+        ('high_court_of_kerala', '2017'),
+        ('high_court_of_kerala', '2018'),
+        ('high_court_of_kerala', '2019'),
+        ('high_court_of_kerala', '2024'),
+        ('high_court_of_kerala', 'unknown_year'),
+        ('supreme_court', 'unknown_year'),
+        ('unknown_court', '2025'),
+        ('unknown_court', 'unknown_year'),
+    ]
+}
+ALL_SHARDS = sorted(MANIFEST)
+
+class FakeIndex:
+    """Stands in for a FAISS index: returns preset distances in ascending order."""
+
+    def __init__(self, distances):
+        self.distances = distances
+        self.ntotal = len(distances)
+
+    def search(self, query_embedding, k):
+        order = sorted(range(self.ntotal), key=lambda i: self.distances[i])[:k]
+        return [[self.distances[i] for i in order]], [order]
+
+@pytest.mark.parametrize('court, expected', [
+    ('HIGH COURT OF KERALA AT ERNAKULAM PRESENT', 'high_court_of_kerala'),
+    ('HIGH COURT OF KERALAAT ERNAKULAM', 'high_court_of_kerala'),
+    ('HIGH COURT OF GUJARAT PRESENT', 'high_court_of_gujarat'),
+    ('HIGH COURT OF GUJARAT AT AHMEDABAD', 'high_court_of_gujarat'),
+    ('Apex Court', 'supreme_court'),
+    ('Court', 'unknown_court'),
+    ('', 'unknown_court'),
+])
+def test_court_key(court, expected):
+    assert court_key(court) == expected
+
+@pytest.mark.parametrize('date, expected', [
+    ('1ST DAY OF JANUARY 2014', '2014'),
+    ('2019', '2019'),
+    ('TUESDAY', 'unknown_year'),
+    (None, 'unknown_year'),
+])
+def test_year_key(date, expected):
+    assert year_key(date) == expected
+
+def test_year_query_keeps_unknown_year_shards():
+    assert sorted(route_query('cases decided in 2015', MANIFEST)) == [
+        'high_court_of_kerala_2015',
+        'high_court_of_kerala_unknown_year',
+        'supreme_court_unknown_year',
+        'unknown_court_unknown_year',
+    ]
+
+def test_court_and_year_query_keeps_unknown_shards():
+    assert sorted(route_query('High Court of Kerala 2024', MANIFEST)) == [
+        'high_court_of_kerala_2024',
+        'high_court_of_kerala_unknown_year',
+        'unknown_court_unknown_year',
+    ]
+
+@pytest.mark.parametrize('query', [
+    'bail under POCSO Act, 2012',
+    'NDPS Act 1985 bail',
+    'Dowry Prohibition Act 1961',
+])
+def test_statute_years_do_not_route(query):
+    assert sorted(route_query(query, MANIFEST)) == ALL_SHARDS
+
+@pytest.mark.parametrize('query', [
+    'CRL.MC NO. 143 OF 2024',
+    'Crl.MC.No. 8940 of 2018',
+    'outcome of W.P. 1234/2016',
+])
+def test_case_number_queries_search_all_shards(query):
+    assert sorted(route_query(query, MANIFEST)) == ALL_SHARDS
+
+@pytest.mark.parametrize('query', [
+    'cases between 2015 and 2018',
+    'cases from 2015 to 2018',
+    'cases 2015-2018',
+])
+def test_year_ranges_are_expanded(query):
+    routed = route_query(query, MANIFEST)
+    for year in ('2015', '2016', '2017', '2018'):
+        assert f'high_court_of_kerala_{year}' in routed
+    assert 'high_court_of_kerala_2014' not in routed
+
+def test_year_without_known_shard_is_dropped():
+    assert sorted(route_query('cases from 1999', MANIFEST)) == ALL_SHARDS
+
+def test_unmatched_court_and_year_fall_back_to_all_shards():
+    assert sorted(route_query('Supreme Court cases 2019', MANIFEST)) == ALL_SHARDS
+
+def test_query_without_court_or_year_searches_all_shards():
+    assert sorted(route_query('cases under Section 498A', MANIFEST)) == ALL_SHARDS
+
+def test_search_shards_merges_top_k_by_distance():
+    shards = {
+        'a': (FakeIndex([0.5, 0.1, 0.9]), [{'file': 'a0'}, {'file': 'a1'}, {'file': 'a2'}]),
+        'b': (FakeIndex([0.3, 0.7]), [{'file': 'b0'}, {'file': 'b1'}]),
+        'c': (FakeIndex([0.2]), [{'file': 'c0'}]),
+    }
+    results = search_shards(None, shards, ['a', 'b', 'c'], top_k=4)
+    assert [r['metadata']['file'] for r in results] == ['a1', 'c0', 'b0', 'a0']
+    assert [r['distance'] for r in results] == [0.1, 0.2, 0.3, 0.5]
+
+def test_search_shards_only_searches_routed_shards():
+    shards = {
+        'a': (FakeIndex([0.5]), [{'file': 'a0'}]),
+        'b': (FakeIndex([0.1]), [{'file': 'b0'}]),
+    }
+    results = search_shards(None, shards, ['a', 'missing'], top_k=5)
+    assert [r['metadata']['file'] for r in results] == ['a0']
@@ -6,6 +6,10 @@ import faiss
 import logging
 from pathlib import Path
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from shards import (SHARD_FOLDER, MANIFEST_PATH, court_key, year_key, shard_name,
+                    write_shard, update_manifest, load_manifest, load_shard, load_shard_files, route_query, search_shards)
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
@@ -13,8 +17,6 @@ logger = logging.getLogger(__name__)
 
 # Folder paths
 CLEANED_FOLDER = r'C:/Users/sreevishak/Desktop/DUK/legalchatbot/cleaned_data'
-VECTOR_STORE_PATH = r'C:/Users/sreevishak/Desktop/DUK/legalchatbot/vector_store.faiss'
-METADATA_PATH = r'C:/Users/sreevishak/Desktop/DUK/legalchatbot/metadata.json'
 
 # Load sentence transformer model
 model = SentenceTransformer('all-MiniLM-L6-v2')
@@ -27,12 +29,11 @@ def normalize_sections(sections):
             cleaned.add(sec.upper())
     return list(cleaned)
 
-def create_vector_store():
+def load_cases():
     json_files = [f for f in os.listdir(CLEANED_FOLDER) if f.endswith('.json')]
     logger.info(f"Found {len(json_files)} cleaned JSON files.")
 
-    documents = []
-    metadata = []
+    shards = {}
     for json_file in json_files:
         file_path = os.path.join(CLEANED_FOLDER, json_file)
         try:
@@ -64,8 +65,7 @@ def create_vector_store():
                 f"{data['outcome']} {data['outcome']} "
                 f"{data['case_id']}"
             )
-            documents.append(text)
-            metadata.append({
+            meta = {
                 'file': json_file,
                 'case_id': data['case_id'],
                 'court': data['court'],
@@ -74,31 +74,90 @@ def create_vector_store():
                 'sections': data['sections'],
                 'outcome': data['outcome'],
                 'full_text': full_text[:500]
-            })
+            }
+            documents, metadata = shards.setdefault(shard_name(meta), ([], []))
+            documents.append(text)
+            metadata.append(meta)
         except Exception as e:
             logger.error(f"Error loading {json_file}: {e}")
+    return shards
 
-    logger.info("Generating embeddings...")
+def build_shard(name, documents, metadata):
+    logger.info(f"Generating embeddings for shard {name} ({len(documents)} cases)...")
     embeddings = model.encode(documents, show_progress_bar=True)
 
     dimension = embeddings.shape[1]
     index = faiss.IndexFlatL2(dimension)
     index.add(embeddings)
-    
-    faiss.write_index(index, VECTOR_STORE_PATH)
-    with open(METADATA_PATH, 'w', encoding='utf-8') as f:
-        json.dump(metadata, f, ensure_ascii=False, indent=4)
-    logger.info(f"Vector store saved to {VECTOR_STORE_PATH}, metadata to {METADATA_PATH}")
+
+    generation = write_shard(name, index, metadata)
+    return name, {
+        'generation': generation,
+        'court': court_key(metadata[0]['court']),
+        'year': year_key(metadata[0]['date']),
+        'size': len(metadata)
+    }
+
+def find_stale_shards(cases, manifest, rebuilt):
+    # Shards outside a partial rebuild keep their old cases; report the ones
+    # whose case files no longer match what load_cases() assigns to them
+    stale = []
+    for name in sorted(set(cases) | set(manifest)):
+        if name in rebuilt:
+            continue
+        expected = {meta['file'] for meta in cases[name][1]} if name in cases else set()
+        current = load_shard_files(name, manifest[name]) if name in manifest else set()
+        if expected != current:
+            stale.append(name)
+    return stale
+
+def create_vector_store(shard_names=None, workers=1):
+    # With no shard_names every shard is rebuilt and shards that no longer have
+    # cases are dropped. Otherwise only the named shards are rebuilt (or dropped
+    # when empty); cases that moved to or from other shards are only reported
+    cases = load_cases()
+    manifest = load_manifest()
+    removed = []
+    if shard_names is None:
+        shards = cases
+    else:
+        shards = {name: cases[name] for name in shard_names if name in cases}
+        removed = [name for name in shard_names if name not in cases and name in manifest]
+        missing = set(shard_names) - set(cases) - set(removed)
+        if missing:
+            logger.warning(f"No cases found for shards: {', '.join(sorted(missing))}")
+        if removed:
+            logger.info(f"Dropping shards with no cases left: {', '.join(sorted(removed))}")
+        stale = find_stale_shards(cases, manifest, set(shard_names))
+        if stale:
+            logger.warning(
+                f"Cases moved, were added or were removed in shards outside this rebuild: {', '.join(stale)}. "
+                "Rebuild them too, or run a full rebuild, to avoid missing or duplicate cases."
+            )
+    logger.info(f"Building {len(shards)} shards: {', '.join(sorted(shards))}")
+
+    if workers > 1:
+        # Each worker process loads its own model and holds only its shard's embeddings
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(build_shard, name, documents, metadata) for name, (documents, metadata) in shards.items()]
+            entries = dict(future.result() for future in futures)
+    else:
+        entries = dict(build_shard(name, documents, metadata) for name, (documents, metadata) in shards.items())
+
+    update_manifest(entries, removed=removed, replace=shard_names is None)
+    logger.info(f"Vector store shards saved to {SHARD_FOLDER}, manifest to {MANIFEST_PATH}")
+
+def load_vector_store():
+    manifest = load_manifest()
+    return manifest, {name: load_shard(name, info) for name, info in manifest.items()}
 
 def query_vector_store(query, top_k=20):  # Further increased top_k
-    index = faiss.read_index(VECTOR_STORE_PATH)
-    with open(METADATA_PATH, 'r', encoding='utf-8') as f:
-        metadata = json.load(f)
+    manifest, shards = load_vector_store()
+    names = route_query(query, manifest)
+    logger.debug(f"Routing query to shards: {names}")
 
     query_embedding = model.encode([query])
-    distances, indices = index.search(query_embedding, top_k)
-    results = [{'metadata': metadata[idx], 'distance': float(dist)} for idx, dist in zip(indices[0], distances[0])]
-    return results
+    return search_shards(query_embedding, shards, names, top_k)
 
 def filter_results(query, results):
     filtered = []
@@ -138,7 +197,8 @@ def rag_chatbot(query):
     return response
 
 if __name__ == "__main__":
-    create_vector_store()
+    # Usage: python vecrtor.py [shard_name ...]  (no names rebuilds every shard)
+    create_vector_store(sys.argv[1:] or None, workers=min(4, os.cpu_count() or 1))
 
     sample_queries = [
         "What cases were quashed in 2015?",